@@ -2,12 +2,15 @@
 
 import argparse
 import hashlib
+import io
 import multiprocessing
 import logging
 from enum import Enum
-from typing import Any, Optional, Union
+from typing import Any, Callable, Optional, TextIO, Union, cast
 import re
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from functools import cache
 from datetime import datetime
@@ -51,6 +54,9 @@ STRATEGIES = [
     "latest_webpage_link",
 ]
 
+# Number of sources of a single app whose upstream is checked concurrently
+SOURCES_WORKERS = 4
+
 
 class AutoUpdateError(RuntimeError):
     pass
@@ -224,30 +230,48 @@ class AppAutoUpdater:
         branch_name = ""
         string_input = ""
 
-        for source, infos in self.sources.items():
-            update = self.get_source_update(source, infos)
-            if update is None:
-                continue
-            # We assume we'll create a PR
-            state = State.created
-            version, assets, msg = update
-
-            if source == "main":
-                main_version = version
-                branch_name = f"ci-auto-update-{version}"
-                pr_title = f"Upgrade to v{version}"
-
-            if msg:
-                commit_msg += f"\n- `{source}` v{version}: {msg}"
-                string_input += f"\n{source}v{version}"
-
-            self.repo.manifest_raw = self.replace_version_and_asset_in_manifest(
-                self.repo.manifest_raw,
-                version,
-                assets,
-                infos,
-                is_main=source == "main",
-            )
+        # Upstream lookups are independent network round-trips, so run them
+        # concurrently and only apply their results to the manifest in order.
+        # Each lookup prints to a buffer of its own, replayed in the same order
+        # so that the app's log stays readable.
+        stdout = ThreadedStdout(sys.stdout)
+        sys.stdout = cast(TextIO, stdout)
+        try:
+            with ThreadPoolExecutor(max_workers=SOURCES_WORKERS) as executor:
+                checks = executor.map(
+                    lambda item: stdout.capture(self.get_source_update, *item),
+                    self.sources.items(),
+                )
+                for (source, infos), (output, update, error) in zip(
+                    self.sources.items(), checks
+                ):
+                    print(output, end="")
+                    if error is not None:
+                        raise error
+                    if update is None:
+                        continue
+                    # We assume we'll create a PR
+                    state = State.created
+                    version, assets, msg = update
+
+                    if source == "main":
+                        main_version = version
+                        branch_name = f"ci-auto-update-{version}"
+                        pr_title = f"Upgrade to v{version}"
+
+                    if msg:
+                        commit_msg += f"\n- `{source}` v{version}: {msg}"
+                        string_input += f"\n{source}v{version}"
+
+                    self.repo.manifest_raw = self.replace_version_and_asset_in_manifest(
+                        self.repo.manifest_raw,
+                        version,
+                        assets,
+                        infos,
+                        is_main=source == "main",
+                    )
+        finally:
+            sys.stdout = stdout.stdout
 
         if state == State.up_to_date:
             return (State.up_to_date, "", "", "")
@@ -545,23 +569,15 @@ class AppAutoUpdater:
                 raise ValueError(
                     "For the latest tag strategies, only asset = 'tarball' is supported"
                 )
-            raw_tags = api.tags()
+            # Stupid ad-hoc patch for snweb which has a gazillion tags for different components in their repo
+            # and we need to get to second page to get the ones relevant for the app ...
+            raw_tags = api.tags(max_pages=2 if self.app_id == "snweb" else 1)
             try:
                 tags = [t["name"] for t in raw_tags]
             except TypeError as e:
                 raise Exception(
                     f"Failed to get tag names with raw_tags: {raw_tags}. Original TypeError: {e}"
                 )
-
-            if self.app_id == "snweb":
-                # Stupid ad-hoc patch for snweb which has a gazillion tags for different components in their repo
-                # and we need to get to second page to get the ones relevant for the app ...
-                tags += [
-                    t["name"]
-                    for t in api.internal_api(
-                        f"repos/{api.upstream_repo}/tags?per_page=100&page=2"
-                    )
-                ]
             latest_version_orig, latest_version = self.relevant_versions(
                 tags, self.app_id, version_re
             )
@@ -700,6 +716,37 @@ def paste_on_haste(data):
         raise
 
 
+class ThreadedStdout:
+    """Give each thread running capture() its own output buffer, other threads
+    keep writing to the wrapped stdout"""
+
+    def __init__(self, stdout: Any) -> None:
+        self.stdout = stdout
+        self.local = threading.local()
+
+    def write(self, x: str) -> int:
+        out: TextIO = getattr(self.local, "buffer", self.stdout)
+        return out.write(x)
+
+    def flush(self) -> None:
+        out: TextIO = getattr(self.local, "buffer", self.stdout)
+        out.flush()
+
+    def capture(
+        self, func: Callable[..., Any], *args: Any
+    ) -> tuple[str, Any, Optional[Exception]]:
+        """Call func, returning what it printed along with its result or error"""
+        self.local.buffer = io.StringIO()
+        result, error = None, None
+        try:
+            result = func(*args)
+        except Exception as e:
+            error = e
+        output = self.local.buffer.getvalue()
+        del self.local.buffer
+        return output, result, error
+
+
 class StdoutSwitch:
     class DummyFile:
         def __init__(self) -> None:
@@ -708,6 +755,9 @@ class StdoutSwitch:
         def write(self, x: str) -> None:
             self.result += x
 
+        def flush(self) -> None:
+            pass
+
     def __init__(self) -> None:
         self.save_stdout = sys.stdout
         sys.stdout = self.DummyFile()  # type: ignore
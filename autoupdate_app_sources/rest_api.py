@@ -1,14 +1,334 @@
 #!/usr/bin/env python3
 
+import inspect
+import logging
+import os
 import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from enum import Enum
-from typing import Any, Optional
+from functools import lru_cache
+from itertools import takewhile
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional, Sequence, Union, cast
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
 
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from lxml import html as lxml_html
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson as json
+except ImportError:
+    import json  # type: ignore[no-redef]
 
 ITEMS_LIMIT = 100
+TIMEOUT = 30
+USER_AGENT = "apps_tools/1.0"
+# Stay polite with api.github.com when querying it from many threads
+GITHUB_MAX_WORKERS = 10
+# When a forge says we are about to run out of requests, wait for its rate
+# limit to reset, unless that is too far away to be worth blocking on
+RATELIMIT_THRESHOLD = 5
+RATELIMIT_MAX_WAIT = 300
+
+# JSON documents are kept along with their ETag/Last-Modified validators, so
+# that the next run only downloads them again if they changed upstream
+HTTP_CACHE_PATH = (
+    Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    / "apps_tools"
+    / "rest_api.sqlite"
+)
+_http_cache_local = threading.local()
+
+# Predicate telling a paginated listing to stop before the given item
+ItemPredicate = Callable[[dict[str, Any]], bool]
+
+_GITLAB_ROOT_RE = re.compile(rb"const url = `(.*?)/api/graphql`")
+_GITEA_ROOT_RE = re.compile(rb"appUrl: '([^']*)',")
+# Web pages are scanned chunk by chunk, keeping the end of the previous chunk
+# around so that matches straddling two chunks are still found
+_SCAN_CHUNK_SIZE = 65536
+_SCAN_OVERLAP = 4096
+# Leaving a response before its end makes urllib3 close the connection instead
+# of returning it to the pool, so pages up to that size are read until the end
+# to keep the connection alive for the API calls that follow
+_SCAN_DRAIN_LIMIT = 1024 * 1024
+
+# Discovery results shared by every API object of this process, so that only
+# the first project of a given forge pays for the lookups
+_gitlab_forge_roots: set[str] = set()
+_gitea_forge_roots: set[str] = set()
+_gitlab_project_ids: dict[tuple[str, str], int] = {}
+# Forge roots are looked up and added from several threads at once
+_forge_roots_lock = threading.Lock()
+
+# Sessions shared by every API object of this process (one per set of
+# credentials), so that a connection to a forge is reused from one app to the
+# next instead of paying a new TLS handshake every time
+_sessions: dict[Optional[tuple[str, str]], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def _new_session(auth: Optional[tuple[str, str]] = None) -> requests.Session:
+    """Create a session with connection pooling and retries on rate limiting
+    and server errors, honoring the Retry-After header"""
+    session = requests.Session()
+    session.auth = auth
+    session.headers.update(
+        {"Accept-Encoding": "gzip, deflate", "User-Agent": USER_AGENT}
+    )
+    if "retry_after_max" in inspect.signature(Retry).parameters:
+        retry = Retry(
+            total=5,
+            backoff_factor=1.0,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods={"GET"},
+            respect_retry_after_header=True,
+            retry_after_max=RATELIMIT_MAX_WAIT,
+            raise_on_status=False,
+        )
+    else:
+        # Older urllib3 can't cap Retry-After and would happily sleep for hours:
+        # leave 429 to _get_json, which waits no more than RATELIMIT_MAX_WAIT
+        retry = Retry(
+            total=5,
+            backoff_factor=1.0,
+            status_forcelist=[500, 502, 503, 504],
+            allowed_methods={"GET"},
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _shared_session(auth: Optional[tuple[str, str]] = None) -> requests.Session:
+    with _sessions_lock:
+        if auth not in _sessions:
+            _sessions[auth] = _new_session(auth)
+        return _sessions[auth]
+
+
+def close_sessions() -> None:
+    """Close the connections kept open by the API objects of this process"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def _scan_page(
+    session: requests.Session, url: str, pattern: re.Pattern[bytes]
+) -> Optional[re.Match[bytes]]:
+    """Stream a web page until pattern is found, without buffering the whole body"""
+    with session.get(url, timeout=TIMEOUT, stream=True) as r:
+        r.raise_for_status()
+        tail = b""
+        for chunk in r.iter_content(chunk_size=_SCAN_CHUNK_SIZE):
+            window = tail + chunk
+            match = pattern.search(window)
+            if match is not None:
+                _drain_small_response(r)
+                return match
+            tail = window[-_SCAN_OVERLAP:]
+    return None
+
+
+def _drain_small_response(r: requests.Response) -> None:
+    """Read what's left of a streamed response if it's known to be small"""
+    try:
+        length = int(r.headers.get("Content-Length", ""))
+    except ValueError:
+        # Unknown size, let the connection be closed rather than read it all
+        return
+    if length <= _SCAN_DRAIN_LIMIT:
+        for _ in r.iter_content(chunk_size=_SCAN_CHUNK_SIZE):
+            pass
+
+
+def _json(r: requests.Response) -> Any:
+    """Decode a JSON response straight from its raw bytes"""
+    return json.loads(r.content)
+
+
+def _http_cache() -> sqlite3.Connection:
+    """This thread's connection to the HTTP cache, opened on first use (sqlite
+    connections can't be shared between threads, nor survive a fork)"""
+    db = getattr(_http_cache_local, "db", None)
+    if db is None or _http_cache_local.pid != os.getpid():
+        HTTP_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(HTTP_CACHE_PATH, timeout=TIMEOUT)
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB, next_url TEXT)"
+        )
+        _http_cache_local.db = db
+        _http_cache_local.pid = os.getpid()
+    return db
+
+
+_CachedResponse = tuple[Optional[str], Optional[str], bytes, Optional[str]]
+
+
+def _http_cache_lookup(url: str) -> Optional[_CachedResponse]:
+    try:
+        row = (
+            _http_cache()
+            .execute(
+                "SELECT etag, last_modified, body, next_url FROM responses WHERE url = ?",
+                (url,),
+            )
+            .fetchone()
+        )
+        return cast(Optional[_CachedResponse], row)
+    except (sqlite3.Error, OSError) as e:
+        logging.debug(f"Could not read HTTP cache: {e}")
+        return None
+
+
+def _http_cache_store(url: str, r: requests.Response, next_url: Optional[str]) -> None:
+    etag = r.headers.get("ETag")
+    last_modified = r.headers.get("Last-Modified")
+    if etag is None and last_modified is None:
+        return
+    try:
+        db = _http_cache()
+        with db:
+            db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, r.content, next_url),
+            )
+    except (sqlite3.Error, OSError) as e:
+        logging.debug(f"Could not write HTTP cache: {e}")
+
+
+def _rate_limit(r: requests.Response) -> Optional[tuple[int, float]]:
+    """Requests left and seconds until the rate limit resets, from GitHub's
+    X-RateLimit-* or GitLab's RateLimit-* headers"""
+    remaining = r.headers.get(
+        "X-RateLimit-Remaining", r.headers.get("RateLimit-Remaining")
+    )
+    reset = r.headers.get("X-RateLimit-Reset", r.headers.get("RateLimit-Reset"))
+    if remaining is None or reset is None:
+        return None
+    try:
+        return int(remaining), int(reset) - time.time()
+    except ValueError:
+        return None
+
+
+def _wait_for_rate_limit(r: requests.Response, threshold: int) -> bool:
+    """Sleep until the rate limit resets if fewer than threshold requests are
+    left, telling whether we did"""
+    rate_limit = _rate_limit(r)
+    if rate_limit is None:
+        return False
+    remaining, wait = rate_limit
+    if remaining >= threshold or wait > RATELIMIT_MAX_WAIT:
+        return False
+    logging.warning(
+        f"Only {remaining} requests left on {urlsplit(r.url).netloc}, "
+        f"waiting {max(wait, 0):.0f}s for the rate limit to reset"
+    )
+    time.sleep(max(wait, 0))
+    return True
+
+
+def _get_json(session: requests.Session, url: str) -> tuple[Any, Optional[str]]:
+    """GET a JSON document and the URL of its next page, revalidating the copy
+    cached by a previous run instead of downloading it again"""
+    headers = {}
+    cached = _http_cache_lookup(url)
+    if cached is not None:
+        etag, last_modified, _, _ = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    r = session.get(url, headers=headers, timeout=TIMEOUT)
+    if r.status_code in (403, 429):
+        # Rate limit exceeded (GitHub answers 403 for its primary one): wait
+        # for it to reset, then try once more
+        if _wait_for_rate_limit(r, threshold=1):
+            r = session.get(url, headers=headers, timeout=TIMEOUT)
+    elif r.ok or r.status_code == 304:
+        _wait_for_rate_limit(r, threshold=RATELIMIT_THRESHOLD)
+    if r.status_code == 304 and cached is not None:
+        _, _, body, cached_next_url = cached
+        return json.loads(body), cached_next_url
+    r.raise_for_status()
+    next_url = _next_page_url(r)
+    _http_cache_store(url, r, next_url)
+    return _json(r), next_url
+
+
+def _query(**params: Optional[str]) -> str:
+    """Build a query string out of the parameters that are set"""
+    query = urlencode({key: value for key, value in params.items() if value})
+    return f"?{query}" if query else ""
+
+
+def _next_page_url(r: requests.Response) -> Optional[str]:
+    """Follow the Link header, or GitLab's X-Next-Page when it's missing"""
+    next_url = r.links.get("next", {}).get("url")
+    if next_url:
+        return next_url
+    next_page = r.headers.get("X-Next-Page")
+    if not next_page:
+        return None
+    parts = urlsplit(r.url)
+    query = dict(parse_qsl(parts.query))
+    query["page"] = next_page
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _paginate(
+    session: requests.Session,
+    url: str,
+    stop: Optional[ItemPredicate] = None,
+    max_pages: Optional[int] = None,
+) -> Iterator[dict[str, Any]]:
+    """Yield the items of a list endpoint page after page, until stop(item) is
+    true or max_pages pages were read (all of them if None)"""
+    pages = 0
+    next_url: Optional[str] = url
+    while next_url:
+        items, next_url = _get_json(session, next_url)
+        for item in items:
+            if stop is not None and stop(item):
+                return
+            yield item
+        pages += 1
+        if max_pages is not None and pages >= max_pages:
+            return
+
+
+def _until(
+    items: Iterator[dict[str, Any]], stop: Optional[ItemPredicate]
+) -> Iterator[dict[str, Any]]:
+    """Stop iterating before the first item for which stop(item) is true"""
+    if stop is None:
+        return items
+    return takewhile(lambda item: not stop(item), items)
+
+
+def _known_forge_root(forge_roots: set[str], project_url: str) -> Optional[str]:
+    with _forge_roots_lock:
+        return next(
+            (root for root in forge_roots if project_url.startswith(f"{root}/")),
+            None,
+        )
+
+
+def _add_forge_root(forge_roots: set[str], forge_root: str) -> None:
+    with _forge_roots_lock:
+        forge_roots.add(forge_root)
 
 
 class RefType(Enum):
@@ -17,30 +337,122 @@ class RefType(Enum):
     releases = 3
 
 
+# The URLs below only depend on their arguments and get rebuilt for the same
+# refs over and over, so they are memoized
+
+
+@lru_cache(maxsize=4096)
+def _github_url_for_ref(upstream: str, ref: str, ref_type: RefType) -> str:
+    if ref_type == RefType.tags or ref_type == RefType.releases:
+        return f"{upstream}/archive/refs/tags/{ref}.tar.gz"
+    elif ref_type == RefType.commits:
+        return f"{upstream}/archive/{ref}.tar.gz"
+    else:
+        raise NotImplementedError
+
+
+@lru_cache(maxsize=4096)
+def _github_changelog_for_ref(
+    upstream: str, new_ref: str, old_ref: str, ref_type: RefType
+) -> str:
+    if ref_type == RefType.commits:
+        return f"{upstream}/compare/{old_ref}...{new_ref}"
+    else:
+        return f"{upstream}/releases/tag/{new_ref}"
+
+
+@lru_cache(maxsize=4096)
+def _gitlab_url_for_ref(forge_root: str, project_path: str, ref: str) -> str:
+    name = project_path.split("/")[-1]
+    clean_ref = ref.replace("/", "-")
+    return f"{forge_root}/{project_path}/-/archive/{ref}/{name}-{clean_ref}.tar.bz2"
+
+
+@lru_cache(maxsize=4096)
+def _gitlab_changelog_for_ref(
+    forge_root: str, project_path: str, new_ref: str, old_ref: str, ref_type: RefType
+) -> str:
+    if ref_type == RefType.commits:
+        return f"{forge_root}/{project_path}/-/compare/{old_ref}...{new_ref}"
+    elif ref_type == RefType.tags:
+        return f"{forge_root}/{project_path}/-/tags/{new_ref}"
+    elif ref_type == RefType.releases:
+        return f"{forge_root}/{project_path}/-/releases/{new_ref}"
+    else:
+        raise NotImplementedError
+
+
+@lru_cache(maxsize=4096)
+def _gitea_url_for_ref(forge_root: str, project_path: str, ref: str) -> str:
+    return f"{forge_root}/{project_path}/archive/{ref}.tar.gz"
+
+
+@lru_cache(maxsize=4096)
+def _gitea_changelog_for_ref(
+    forge_root: str, project_path: str, new_ref: str, old_ref: str, ref_type: RefType
+) -> str:
+    if ref_type == RefType.commits:
+        return f"{forge_root}/{project_path}/compare/{old_ref}...{new_ref}"
+    else:
+        return f"{forge_root}/{project_path}/releases/tag/{new_ref}"
+
+
 class GithubAPI:
+    __slots__ = ("upstream", "upstream_repo", "auth", "_session")
+
     def __init__(self, upstream: str, auth: Optional[tuple[str, str]] = None):
-        self.upstream = upstream.strip("/")
-        self.upstream_repo = upstream.replace("https://github.com/", "").strip("/")
-        assert len(self.upstream_repo.split("/")) == 2, (
+        parts = urlsplit(upstream)
+        owner, _, name = parts.path.strip("/").partition("/")
+        assert owner and name and "/" not in name, (
             f"'{upstream}' doesn't seem to be a github repository ?"
         )
+        self.upstream = f"{parts.scheme}://{parts.netloc}/{owner}/{name}"
+        self.upstream_repo = f"{owner}/{name}"
         self.auth = auth
+        self._session = _shared_session(auth)
 
     def internal_api(self, uri: str) -> Any:
         url = f"https://api.github.com/{uri}"
-        r = requests.get(url, auth=self.auth)
-        r.raise_for_status()
-        return r.json()
+        return _get_json(self._session, url)[0]
+
+    def _paginate(
+        self,
+        uri: str,
+        stop: Optional[ItemPredicate] = None,
+        max_pages: Optional[int] = None,
+    ) -> Iterator[dict[str, Any]]:
+        return _paginate(
+            self._session, f"https://api.github.com/{uri}", stop, max_pages
+        )
 
-    def tags(self) -> list[dict[str, str]]:
+    def tags(
+        self, stop: Optional[ItemPredicate] = None, max_pages: Optional[int] = 1
+    ) -> list[dict[str, str]]:
         """Get a list of tags for project."""
-        return self.internal_api(
-            f"repos/{self.upstream_repo}/tags?per_page={ITEMS_LIMIT}"
+        return list(
+            self._paginate(
+                f"repos/{self.upstream_repo}/tags?per_page={ITEMS_LIMIT}",
+                stop,
+                max_pages,
+            )
         )
 
-    def commits(self) -> list[dict[str, Any]]:
-        """Get a list of commits for project."""
-        return self.internal_api(f"repos/{self.upstream_repo}/commits")
+    def commits(
+        self,
+        since: Optional[str] = None,
+        branch: Optional[str] = None,
+        stop: Optional[ItemPredicate] = None,
+        max_pages: Optional[int] = 1,
+    ) -> list[dict[str, Any]]:
+        """Get a list of commits for project, only those of branch and more recent
+        than since (ISO 8601 date) if provided."""
+        return list(
+            self._paginate(
+                f"repos/{self.upstream_repo}/commits{_query(sha=branch, since=since)}",
+                stop,
+                max_pages,
+            )
+        )
 
     def tip_of_branch(self, branch: str) -> Any:
         """Get SHA of commit that's tip of provided branch"""
@@ -48,47 +460,75 @@ class GithubAPI:
             "commit"
         ]
 
-    def releases(self) -> list[dict[str, Any]]:
+    def releases(
+        self, stop: Optional[ItemPredicate] = None, max_pages: Optional[int] = 1
+    ) -> list[dict[str, Any]]:
         """Get a list of releases for project."""
-        return self.internal_api(
-            f"repos/{self.upstream_repo}/releases?per_page={ITEMS_LIMIT}"
+        return list(
+            self._paginate(
+                f"repos/{self.upstream_repo}/releases?per_page={ITEMS_LIMIT}",
+                stop,
+                max_pages,
+            )
         )
 
     def url_for_ref(self, ref: str, ref_type: RefType) -> str:
         """Get a URL for a ref."""
-        if ref_type == RefType.tags or ref_type == RefType.releases:
-            return f"{self.upstream}/archive/refs/tags/{ref}.tar.gz"
-        elif ref_type == RefType.commits:
-            return f"{self.upstream}/archive/{ref}.tar.gz"
-        else:
-            raise NotImplementedError
+        return _github_url_for_ref(self.upstream, ref, ref_type)
 
     def changelog_for_ref(self, new_ref: str, old_ref: str, ref_type: RefType) -> str:
         """Get a changelog for a ref."""
-        if ref_type == RefType.commits:
-            return f"{self.upstream}/compare/{old_ref}...{new_ref}"
-        else:
-            return f"{self.upstream}/releases/tag/{new_ref}"
+        return _github_changelog_for_ref(self.upstream, new_ref, old_ref, ref_type)
 
 
 class GitlabAPI:
+    __slots__ = ("upstream", "_session", "_forge_root", "_project_path", "_project_id")
+
     def __init__(self, upstream: str):
-        # Find gitlab api root...
-        self.forge_root = self.get_forge_root(upstream).rstrip("/")
-        self.project_path = upstream.replace(self.forge_root, "").strip("/")
-        self.project_id = self.find_project_id(self.project_path)
+        self.upstream = upstream
+        self._session = _shared_session()
+        self._forge_root: Optional[str] = None
+        self._project_path: Optional[str] = None
+        self._project_id: Optional[int] = None
+
+    # Those require network lookups, so they are only resolved when first needed
+
+    @property
+    def forge_root(self) -> str:
+        if self._forge_root is None:
+            # Find gitlab api root...
+            self._forge_root = self.get_forge_root(self.upstream).rstrip("/")
+        return self._forge_root
+
+    @property
+    def project_path(self) -> str:
+        if self._project_path is None:
+            self._project_path = self.upstream.replace(self.forge_root, "").strip("/")
+        return self._project_path
+
+    @property
+    def project_id(self) -> int:
+        if self._project_id is None:
+            self._project_id = self.find_project_id(self.project_path)
+        return self._project_id
 
     def get_forge_root(self, project_url: str) -> str:
         """A small heuristic based on the content of the html page..."""
-        r = requests.get(project_url)
-        r.raise_for_status()
-        match = re.search(r"const url = `(.*)/api/graphql`", r.text)
+        forge_root = _known_forge_root(_gitlab_forge_roots, project_url)
+        if forge_root is not None:
+            return forge_root
+        match = _scan_page(self._session, project_url, _GITLAB_ROOT_RE)
         assert match is not None, (
             f"No match found for forge root using project url '{project_url}'"
         )
-        return match.group(1)
+        forge_root = match.group(1).decode().rstrip("/")
+        _add_forge_root(_gitlab_forge_roots, forge_root)
+        return forge_root
 
     def find_project_id(self, project: str) -> int:
+        key = (self.forge_root, project)
+        if key in _gitlab_project_ids:
+            return _gitlab_project_ids[key]
         try:
             project = self.internal_api(f"projects/{project.replace('/', '%2F')}")
         except requests.exceptions.HTTPError as err:
@@ -96,131 +536,196 @@ class GitlabAPI:
                 raise
             # Second chance for some buggy gitlab instances...
             name = self.project_path.split("/")[-1]
-            projects = self.internal_api(f"projects?search={name}")
-            project = next(
-                filter(
-                    lambda x: x.get("path_with_namespace") == self.project_path,
-                    projects,
-                )
+            projects = self.internal_api(f"projects?search={name}&simple=true")
+            match = next(
+                (
+                    p
+                    for p in projects
+                    if p.get("path_with_namespace") == self.project_path
+                ),
+                None,
             )
+            if match is None:
+                raise LookupError(
+                    f"project {self.project_path} not found on {self.forge_root}"
+                )
+            project = match
 
         assert isinstance(project, dict)
         project_id = project.get("id", None)
+        if project_id is not None:
+            _gitlab_project_ids[key] = project_id
         return project_id
 
     def internal_api(self, uri: str) -> Any:
         url = f"{self.forge_root}/api/v4/{uri}"
-        r = requests.get(url)
-        r.raise_for_status()
-        return r.json()
+        return _get_json(self._session, url)[0]
+
+    def _paginate(
+        self,
+        uri: str,
+        stop: Optional[ItemPredicate] = None,
+        max_pages: Optional[int] = None,
+    ) -> Iterator[dict[str, Any]]:
+        return _paginate(
+            self._session, f"{self.forge_root}/api/v4/{uri}", stop, max_pages
+        )
 
-    def tags(self) -> list[dict[str, str]]:
+    def tags(
+        self, stop: Optional[ItemPredicate] = None, max_pages: Optional[int] = 1
+    ) -> list[dict[str, str]]:
         """Get a list of tags for project."""
-        return self.internal_api(
-            f"projects/{self.project_id}/repository/tags?per_page={ITEMS_LIMIT}"
+        return list(
+            self._paginate(
+                f"projects/{self.project_id}/repository/tags?per_page={ITEMS_LIMIT}",
+                stop,
+                max_pages,
+            )
         )
 
-    def commits(self) -> list[dict[str, Any]]:
-        """Get a list of commits for project."""
-        return [
-            {
-                "sha": commit["id"],
-                "commit": {"author": {"date": commit["committed_date"]}},
-            }
-            for commit in self.internal_api(
+    def commits(
+        self,
+        since: Optional[str] = None,
+        branch: Optional[str] = None,
+        stop: Optional[ItemPredicate] = None,
+        max_pages: Optional[int] = 1,
+    ) -> list[dict[str, Any]]:
+        """Get a list of commits for project, only those of branch and more recent
+        than since (ISO 8601 date) if provided."""
+        # stop is meant for the GitHub-shaped items, so apply it after reshaping
+        commits = map(
+            self._as_github_commit,
+            self._paginate(
                 f"projects/{self.project_id}/repository/commits"
-            )
-        ]
+                f"{_query(ref_name=branch, since=since)}",
+                max_pages=max_pages,
+            ),
+        )
+        return list(_until(commits, stop))
 
     def tip_of_branch(self, branch: str) -> Any:
         """Get SHA of commit that's tip of provided branch"""
         commit = self.internal_api(
             f"projects/{self.project_id}/repository/branches/{branch}"
         )["commit"]
+        return self._as_github_commit(commit)
+
+    def releases(
+        self, stop: Optional[ItemPredicate] = None, max_pages: Optional[int] = 1
+    ) -> list[dict[str, Any]]:
+        """Get a list of releases for project."""
+        # stop is meant for the GitHub-shaped items, so apply it after reshaping
+        releases = map(
+            self._as_github_release,
+            self._paginate(
+                f"projects/{self.project_id}/releases?per_page={ITEMS_LIMIT}",
+                max_pages=max_pages,
+            ),
+        )
+        return list(_until(releases, stop))
+
+    @staticmethod
+    def _as_github_commit(commit: dict[str, Any]) -> dict[str, Any]:
+        """Reshape a GitLab commit like the GitHub API would return it"""
         return {
             "sha": commit["id"],
             "commit": {"author": {"date": commit["committed_date"]}},
         }
 
-    def releases(self) -> list[dict[str, Any]]:
-        """Get a list of releases for project."""
-        releases = self.internal_api(
-            f"projects/{self.project_id}/releases?per_page={ITEMS_LIMIT}"
-        )
-        retval = []
-        for release in releases:
-            r = {
-                "tag_name": release["tag_name"],
-                "prerelease": False,
-                "draft": False,
-                "html_url": release["_links"]["self"],
-                "assets": [
-                    {
-                        "name": asset["name"],
-                        "browser_download_url": asset["direct_asset_url"],
-                    }
-                    for asset in release["assets"]["links"]
-                ],
+    @staticmethod
+    def _as_github_release(release: dict[str, Any]) -> dict[str, Any]:
+        """Reshape a GitLab release like the GitHub API would return it"""
+        assets = [
+            {"name": asset["name"], "browser_download_url": asset["direct_asset_url"]}
+            for asset in release["assets"]["links"]
+        ]
+        assets += [
+            {
+                "name": f"source.{source['format']}",
+                "browser_download_url": source["url"],
             }
-            for source in release["assets"]["sources"]:
-                r["assets"].append(
-                    {
-                        "name": f"source.{source['format']}",
-                        "browser_download_url": source["url"],
-                    }
-                )
-            retval.append(r)
-
-        return retval
+            for source in release["assets"]["sources"]
+        ]
+        return {
+            "tag_name": release["tag_name"],
+            "prerelease": False,
+            "draft": False,
+            "html_url": release["_links"]["self"],
+            "assets": assets,
+        }
 
     def url_for_ref(self, ref: str, _: RefType) -> str:
-        name = self.project_path.split("/")[-1]
-        clean_ref = ref.replace("/", "-")
-        return f"{self.forge_root}/{self.project_path}/-/archive/{ref}/{name}-{clean_ref}.tar.bz2"
+        return _gitlab_url_for_ref(self.forge_root, self.project_path, ref)
 
     def changelog_for_ref(self, new_ref: str, old_ref: str, ref_type: RefType) -> str:
         """Get a changelog for a ref."""
-        if ref_type == RefType.commits:
-            return (
-                f"{self.forge_root}/{self.project_path}/-/compare/{old_ref}...{new_ref}"
-            )
-        elif ref_type == RefType.tags:
-            return f"{self.forge_root}/{self.project_path}/-/tags/{new_ref}"
-        elif ref_type == RefType.releases:
-            return f"{self.forge_root}/{self.project_path}/-/releases/{new_ref}"
-        else:
-            raise NotImplementedError
+        return _gitlab_changelog_for_ref(
+            self.forge_root, self.project_path, new_ref, old_ref, ref_type
+        )
 
 
 class GiteaForgejoAPI:
+    __slots__ = ("forge_root", "project_path", "_session")
+
     def __init__(self, upstream: str):
+        self._session = _shared_session()
         # Find gitea/forgejo api root...
         self.forge_root = self.get_forge_root(upstream).rstrip("/")
         self.project_path = upstream.replace(self.forge_root, "").lstrip("/")
 
     def get_forge_root(self, project_url: str) -> str:
         """A small heuristic based on the content of the html page..."""
-        r = requests.get(project_url)
-        r.raise_for_status()
-        match = re.search(r"appUrl: '([^']*)',", r.text)
+        forge_root = _known_forge_root(_gitea_forge_roots, project_url)
+        if forge_root is not None:
+            return forge_root
+        match = _scan_page(self._session, project_url, _GITEA_ROOT_RE)
         assert match is not None
-        return match.group(1).replace("\\", "")
+        forge_root = match.group(1).decode().replace("\\", "").rstrip("/")
+        _add_forge_root(_gitea_forge_roots, forge_root)
+        return forge_root
 
     def internal_api(self, uri: str):
         url = f"{self.forge_root}/api/v1/{uri}"
-        r = requests.get(url)
-        r.raise_for_status()
-        return r.json()
+        return _get_json(self._session, url)[0]
+
+    def _paginate(
+        self,
+        uri: str,
+        stop: Optional[ItemPredicate] = None,
+        max_pages: Optional[int] = None,
+    ) -> Iterator[dict[str, Any]]:
+        return _paginate(
+            self._session, f"{self.forge_root}/api/v1/{uri}", stop, max_pages
+        )
 
-    def tags(self) -> list[dict[str, Any]]:
+    def tags(
+        self, stop: Optional[ItemPredicate] = None, max_pages: Optional[int] = 1
+    ) -> list[dict[str, Any]]:
         """Get a list of tags for project."""
-        return self.internal_api(
-            f"repos/{self.project_path}/tags?per_page={ITEMS_LIMIT}"
+        return list(
+            self._paginate(
+                f"repos/{self.project_path}/tags?per_page={ITEMS_LIMIT}",
+                stop,
+                max_pages,
+            )
         )
 
-    def commits(self) -> list[dict[str, Any]]:
-        """Get a list of commits for project."""
-        return self.internal_api(f"repos/{self.project_path}/commits")
+    def commits(
+        self,
+        since: Optional[str] = None,
+        branch: Optional[str] = None,
+        stop: Optional[ItemPredicate] = None,
+        max_pages: Optional[int] = 1,
+    ) -> list[dict[str, Any]]:
+        """Get a list of commits for project, only those of branch and more recent
+        than since (ISO 8601 date) if provided."""
+        return list(
+            self._paginate(
+                f"repos/{self.project_path}/commits{_query(sha=branch, since=since)}",
+                stop,
+                max_pages,
+            )
+        )
 
     def tip_of_branch(self, branch: str) -> Any:
         """Get SHA of commit that's tip of provided branch"""
@@ -232,36 +737,77 @@ class GiteaForgejoAPI:
             "commit": {"author": {"date": commit["timestamp"]}},
         }
 
-    def releases(self) -> list[dict[str, Any]]:
+    def releases(
+        self, stop: Optional[ItemPredicate] = None, max_pages: Optional[int] = 1
+    ) -> list[dict[str, Any]]:
         """Get a list of releases for project."""
-        return self.internal_api(
-            f"repos/{self.project_path}/releases?per_page={ITEMS_LIMIT}"
+        return list(
+            self._paginate(
+                f"repos/{self.project_path}/releases?per_page={ITEMS_LIMIT}",
+                stop,
+                max_pages,
+            )
         )
 
     def url_for_ref(self, ref: str, _: RefType) -> str:
         """Get a URL for a ref."""
-        return f"{self.forge_root}/{self.project_path}/archive/{ref}.tar.gz"
+        return _gitea_url_for_ref(self.forge_root, self.project_path, ref)
 
     def changelog_for_ref(self, new_ref: str, old_ref: str, ref_type: RefType) -> str:
         """Get a changelog for a ref."""
-        if ref_type == RefType.commits:
-            return (
-                f"{self.forge_root}/{self.project_path}/compare/{old_ref}...{new_ref}"
-            )
-        else:
-            return f"{self.forge_root}/{self.project_path}/releases/tag/{new_ref}"
+        return _gitea_changelog_for_ref(
+            self.forge_root, self.project_path, new_ref, old_ref, ref_type
+        )
 
 
 class DownloadPageAPI:
+    __slots__ = ("web_page", "_session")
+
     def __init__(self, upstream: str) -> None:
         self.web_page = upstream
+        self._session = _shared_session()
 
     def get_web_page_links(self) -> dict[str, str]:
-        r = requests.get(self.web_page)
+        r = self._session.get(self.web_page, timeout=TIMEOUT)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, features="lxml")
+        if not r.content.strip():
+            # lxml refuses to parse an empty document
+            return {}
+        tree = lxml_html.fromstring(r.content)
+        # Honor <base href> ourselves and drop it: lxml resolves it (even with
+        # resolve_base_href=False) without handle_failures, so any malformed
+        # link would then raise
+        base_url = self.web_page
+        base = tree.find(".//base[@href]")
+        if base is not None:
+            try:
+                base_url = urljoin(self.web_page, base.get("href"))
+            except ValueError:
+                pass
+            base.drop_tree()
+        # Resolve every relative link in one pass, leaving malformed ones as is
+        # rather than failing on a link we don't even care about
+        tree.make_links_absolute(
+            base_url, resolve_base_href=False, handle_failures="ignore"
+        )
 
+        # str() drops the reference lxml's smart strings keep to the whole tree
         return {
-            link.string: urljoin(self.web_page, link.get("href"))
-            for link in soup.find_all("a")
+            str(link.text_content()): link.get("href")
+            for link in tree.iterfind(".//a[@href]")
         }
+
+
+API = Union[GithubAPI, GitlabAPI, GiteaForgejoAPI, DownloadPageAPI]
+
+
+def gather(
+    apis: Sequence[API], method_name: str, max_workers: int = 16
+) -> dict[API, Any]:
+    """Call the same method (e.g. "tags" or "releases") on many API objects
+    concurrently, and map each of them to its result"""
+    if any(isinstance(api, GithubAPI) for api in apis):
+        max_workers = min(max_workers, GITHUB_MAX_WORKERS)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(getattr(api, method_name)): api for api in apis}
+        return {futures[future]: future.result() for future in as_completed(futures)}